@@ -1,11 +1,21 @@
+import asyncio
+import contextlib
+import contextvars
 import enum
 import functools  # Added for decorator
-import json
+import hmac
 import os
+import queue
 import re
+import signal
 import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
 from email.utils import parseaddr
 
+import click
+import orjson
 import requests
 from flask import (
     Flask,
@@ -14,8 +24,12 @@ from flask import (
     jsonify,
     render_template,
     request,
+    stream_with_context,
 )
-from jinja2 import Template
+from flask.json.provider import JSONProvider
+from jinja2 import Template, TemplateError
+
+from schema import DATABASE_PATH, SCHEMA_VERSION
 
 
 class CustomerStatus(enum.Enum):
@@ -24,75 +38,301 @@ class CustomerStatus(enum.Enum):
     NO_ACTION = 3  # No action needed
 
 
+# Precomputed once so request validation doesn't iterate the enum
+_VALID_STATUSES = frozenset(s.value for s in CustomerStatus)
+_VALID_STATUS_MSG = ", ".join(f"{s.value}: {s.name}" for s in CustomerStatus)
+_INVALID_STATUS_ERROR = f"Invalid status. Valid options are: {_VALID_STATUS_MSG}"
+_STATUS_NAME = {s.value: s.name for s in CustomerStatus}
+
+# Pre-serialized bodies for the hot write endpoints. Only filled with values
+# that need no JSON escaping: domains that passed _DOMAIN_RE, enum names and
+# allow-listed setting keys.
+_OK_CUSTOMER_STATUS = (
+    b'{"success":true,"message":"Customer %s status has been set to %s"}'
+)
+_OK_SETTING = b'{"success":true,"message":"Setting \'%s\' has been updated"}'
+
+_EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+# Lowercased domain with at least one dot, checked in a single regex pass
+_DOMAIN_RE = re.compile(r"\A[a-z0-9.-]+\.[a-z0-9.-]+\Z", re.ASCII)
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, used by jsonify and request.get_json"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping the decode
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+
 app = Flask(__name__, template_folder="templates")
+app.json = OrjsonProvider(app)
+
+
+# Database setup (DATABASE_PATH and SCHEMA_VERSION live in schema.py)
+
+# Idle connections kept open between requests, so each request reuses a warm
+# connection (and its page cache) instead of reopening the database files
+DB_POOL_SIZE = 8
+# LIFO so the most recently used (warmest) connection is handed out first
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+# SQLite allows one writer at a time, so all writes in this process share a
+# single connection and queue up on a lock instead of on SQLITE_BUSY retries
+_write_lock = threading.Lock()
+_write_conn = None
 
-# Database setup
-DATABASE_PATH = "customer_tracker.db"
+
+def _apply_connection_pragmas(db):
+    """Apply the per-connection PRAGMAs (these are not stored in the db file)"""
+    db.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, avoids most fsyncs
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    db.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+
+
+def _connect():
+    """Open a new database connection for the pool"""
+    # Pooled connections are handed between worker threads
+    db = sqlite3.connect(
+        DATABASE_PATH,
+        check_same_thread=False,
+        cached_statements=256,  # Room for every query below, per connection
+    )
+    db.row_factory = sqlite3.Row  # This enables column access by name
+    _apply_connection_pragmas(db)
+    return db
 
 
 def get_db():
     """Get a database connection for the current request context"""
     db = getattr(g, "_database", None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE_PATH)
-        db.row_factory = sqlite3.Row  # This enables column access by name
+        try:
+            db = _db_pool.get_nowait()
+        except queue.Empty:
+            db = _connect()
+        g._database = db
     return db
 
 
+@contextlib.contextmanager
+def write_db():
+    """Run one write transaction on the process-wide write connection"""
+    global _write_conn
+    with _write_lock:
+        if _write_conn is None:
+            _write_conn = _connect()
+        db = _write_conn
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+
+
+def _reset_db_pool():
+    """Give a forked worker its own empty pool and write connection"""
+    # SQLite connections must not be shared across processes, so a worker
+    # forked by gunicorn never reuses connections opened by its parent
+    global _db_pool, _write_lock, _write_conn
+    _db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+    _write_lock = threading.Lock()
+    _write_conn = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_db_pool)
+
+
 @app.teardown_appcontext
 def close_connection(exception):
-    """Close the database connection at the end of the request"""
-    db = getattr(g, "_database", None)
-    if db is not None:
+    """Return the database connection to the pool at the end of the request"""
+    db = g.pop("_database", None)
+    if db is None:
+        return
+    # Never hand an open transaction to the next request
+    if db.in_transaction:
+        db.rollback()
+    try:
+        _db_pool.put_nowait(db)
+    except queue.Full:
         db.close()
 
 
+# Every statement is idempotent, so the whole script can be re-run to bring
+# an older database up to SCHEMA_VERSION. It runs as one transaction.
+_SCHEMA_SQL = f"""
+BEGIN;
+
+-- Create customers table if it doesn't exist
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    domain TEXT UNIQUE NOT NULL,
+    status INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status_changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Covering index so status checks by domain never touch the table rows
+CREATE INDEX IF NOT EXISTS idx_customers_domain_status
+ON customers(domain, status);
+
+-- Single-row counter bumped by every customer write, used as the ETag for
+-- the customer read endpoints
+CREATE TABLE IF NOT EXISTS customers_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO customers_version (id, version) VALUES (1, 0);
+
+-- Create settings table
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Insert default settings if they don't exist (default password is empty)
+INSERT OR IGNORE INTO settings (key, value) VALUES ('user_email', '');
+INSERT OR IGNORE INTO settings (key, value) VALUES ('password', '');
+
+PRAGMA user_version = {SCHEMA_VERSION};
+
+COMMIT;
+"""
+
+# Queries used while serving requests. Keeping each one in a single constant
+# means every call site sends identical SQL text, so sqlite3's per-connection
+# statement cache hands back the already-prepared statement.
+
+# Insert new customers, or update existing ones in the same statement.
+# status_changed_at is only bumped when the status actually changes.
+_SQL_UPSERT_CUSTOMER = """
+    INSERT INTO customers (domain, status, created_at, status_changed_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT(domain) DO UPDATE SET
+        status = excluded.status,
+        status_changed_at = CASE
+            WHEN customers.status <> excluded.status THEN CURRENT_TIMESTAMP
+            ELSE customers.status_changed_at
+        END
+"""
+_SQL_BUMP_CUSTOMERS_VERSION = "UPDATE customers_version SET version = version + 1"
+_SQL_GET_CUSTOMERS_VERSION = "SELECT version FROM customers_version"
+_SQL_GET_CUSTOMERS = """
+    SELECT domain, status, created_at, status_changed_at
+    FROM customers
+    ORDER BY domain
+"""
+_SQL_GET_CUSTOMER = """
+    SELECT domain, status, created_at, status_changed_at
+    FROM customers
+    WHERE domain = ?
+"""
+# The planner prefers the implicit UNIQUE index, which still has to visit the
+# table row, so force the covering index
+_SQL_GET_CUSTOMER_STATUS = (
+    "SELECT status FROM customers INDEXED BY idx_customers_domain_status "
+    "WHERE domain = ?"
+)
+_SQL_GET_SETTINGS = "SELECT key, value, updated_at FROM settings"
+_SQL_GET_SETTING = "SELECT key, value, updated_at FROM settings WHERE key = ?"
+# Insert or update in one statement, so concurrent first writes of the same
+# key can't race each other
+_SQL_UPSERT_SETTING = """
+    INSERT INTO settings (key, value, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(key) DO UPDATE SET
+        value = excluded.value,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _create_schema(conn):
+    """Create any missing tables and default settings"""
+    # WAL is persistent, so setting it once here covers every connection.
+    # It can't be changed inside a transaction, so it runs before the script.
+    (journal_mode,) = conn.execute("PRAGMA journal_mode=WAL").fetchone()
+    if journal_mode != "wal":
+        # e.g. on network filesystems, where SQLite can't use shared memory
+        app.logger.warning(
+            "Could not enable WAL for %s (journal_mode=%s); writes will block readers",
+            DATABASE_PATH,
+            journal_mode,
+        )
+    _apply_connection_pragmas(conn)
+    conn.executescript(_SCHEMA_SQL)
+
+
 def init_db():
     """Initialize the database and create tables if they don't exist"""
-    # Use a separate connection for initialization
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-        # Create customers table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS customers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            domain TEXT UNIQUE NOT NULL,
-            status INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status_changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-
-        # Create settings table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
+    global _initialized
+    with _init_lock:
+        # Only the first call in a process does any work
+        if _initialized:
+            return
+        # Use a separate connection for initialization
+        with contextlib.closing(sqlite3.connect(DATABASE_PATH)) as conn:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version < SCHEMA_VERSION:
+                _create_schema(conn)
+        _initialized = True
 
-        # Insert default settings if they don't exist
-        cursor.execute(
-            "INSERT OR IGNORE INTO settings (key, value) VALUES ('user_email', '')"
-        )
-        cursor.execute(
-            "INSERT OR IGNORE INTO settings (key, value) VALUES ('password', '')"
-        )  # Default password is empty
 
-        conn.commit()
+@app.cli.command("db-init")
+def db_init_command():
+    """Create or upgrade the database schema."""
+    init_db()
+    click.echo(f"Database {DATABASE_PATH} is at schema version {SCHEMA_VERSION}.")
+
+
+# Settings rarely change but are read on every protected request (for the
+# password), so the whole table is cached briefly. update_setting()
+# invalidates this worker's copy; the TTL bounds how stale other workers are.
+SETTINGS_CACHE_TTL = 5  # seconds
+_settings_cache = {"data": None, "expires": 0.0}
+_settings_lock = threading.Lock()
+
+
+def _load_settings():
+    """Return all settings as a {key: value} dict"""
+    with _settings_lock:
+        if _settings_cache["expires"] <= time.monotonic():
+            rows = get_db().execute(_SQL_GET_SETTINGS).fetchall()
+            _settings_cache["data"] = {row["key"]: row["value"] for row in rows}
+            _settings_cache["expires"] = time.monotonic() + SETTINGS_CACHE_TTL
+        return _settings_cache["data"]
+
+
+def _read_setting(key):
+    """Return the raw value of a setting ('' if it isn't set)"""
+    return _load_settings().get(key, "")
 
 
 # --- Authentication ---
-def check_auth(password_attempt):
-    """Check if the provided password matches the one in the DB."""
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'password'")
-    result = cursor.fetchone()
-    stored_password = result["value"] if result else None
+def check_auth(password_attempt, stored_password):
+    """Check if the provided password matches the stored one."""
     # If no password is set in DB, auth is effectively disabled
-    return stored_password and password_attempt == stored_password
+    if not stored_password:
+        return False
+    # Constant-time comparison so response timing doesn't leak the password.
+    # Compared as bytes because compare_digest rejects non-ASCII str.
+    return hmac.compare_digest(
+        stored_password.encode("utf-8"), (password_attempt or "").encode("utf-8")
+    )
 
 
 def authenticate():
@@ -110,17 +350,13 @@ def require_auth(f):
 
     @functools.wraps(f)
     def decorated(*args, **kwargs):
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT value FROM settings WHERE key = 'password'")
-        result = cursor.fetchone()
-        stored_password = result["value"] if result and result["value"] else None
+        stored_password = _read_setting("password") or None
 
         # Only enforce auth if a password is set in the database
         if stored_password:
             auth = request.authorization
             # If no auth header or incorrect password, request authentication
-            if not auth or not check_auth(auth.password):
+            if not auth or not check_auth(auth.password, stored_password):
                 return authenticate()
         # If no password is set OR auth is successful, proceed to the view
         return f(*args, **kwargs)
@@ -131,6 +367,53 @@ def require_auth(f):
 # --- End Authentication ---
 
 
+# Largest number of customer updates written in a single transaction
+STATUS_BATCH_SIZE = 50
+
+
+def _validate_status_update(data):
+    """Validate a {"domain": ..., "status": ...} update.
+
+    Returns the normalized (domain, status) pair, or raises ValueError with a
+    message suitable for the client.
+    """
+    # Validate required fields
+    if not isinstance(data, dict) or "domain" not in data or "status" not in data:
+        raise ValueError("Both domain and status are required")
+
+    domain = data["domain"]
+    if not isinstance(domain, str):
+        raise ValueError("Invalid domain format")
+    domain = domain.strip().lower()
+
+    # Validate domain
+    if not _DOMAIN_RE.match(domain):
+        raise ValueError("Invalid domain format")
+
+    # Validate status
+    try:
+        status = int(data["status"])
+    except (TypeError, ValueError):
+        raise ValueError("Status must be a number")
+    if status not in _VALID_STATUSES:
+        raise ValueError(_INVALID_STATUS_ERROR)
+
+    return domain, status
+
+
+def _set_customer_statuses(updates):
+    """Write a list of validated (domain, status) pairs to the database"""
+    # Commit in fixed-size batches so one transaction (and fsync) covers many
+    # rows without holding the write lock for an unbounded time
+    for start in range(0, len(updates), STATUS_BATCH_SIZE):
+        with write_db() as db:
+            db.executemany(
+                _SQL_UPSERT_CUSTOMER, updates[start : start + STATUS_BATCH_SIZE]
+            )
+            # Invalidate cached copies of the customer endpoints
+            db.execute(_SQL_BUMP_CUSTOMERS_VERSION)
+
+
 @app.route("/api/set_customer_status", methods=["POST"])
 # No auth required for this endpoint by default
 def set_customer_status():
@@ -138,156 +421,193 @@ def set_customer_status():
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
 
-    data = request.get_json()
+    try:
+        domain, status = _validate_status_update(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Validate required fields
-    if "domain" not in data or "status" not in data:
-        return jsonify({"error": "Both domain and status are required"}), 400
+    try:
+        _set_customer_statuses([(domain, status)])
 
-    domain = data["domain"].strip().lower()
-    status = data["status"]
+        return Response(
+            _OK_CUSTOMER_STATUS % (domain.encode(), _STATUS_NAME[status].encode()),
+            mimetype="application/json",
+        )
 
-    # Validate domain
-    if not domain or "." not in domain:
-        return jsonify({"error": "Invalid domain format"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-    # Validate status
-    try:
-        status = int(status)
-        if status not in [s.value for s in CustomerStatus]:
-            valid_statuses = [f"{s.value}: {s.name}" for s in CustomerStatus]
-            return jsonify(
-                {
-                    "error": f"Invalid status. Valid options are: {', '.join(valid_statuses)}"
-                }
-            ), 400
-    except ValueError:
-        return jsonify({"error": "Status must be a number"}), 400
 
-    try:
-        db = get_db()
-        cursor = db.cursor()
-
-        # Check if customer exists and get current status if it does
-        cursor.execute("SELECT id, status FROM customers WHERE domain = ?", (domain,))
-        result = cursor.fetchone()
-
-        if result:
-            # If status has changed, update status_changed_at timestamp
-            if result["status"] != status:
-                cursor.execute(
-                    "UPDATE customers SET status = ?, status_changed_at = CURRENT_TIMESTAMP WHERE domain = ?",
-                    (status, domain),
-                )
-            else:
-                # Status hasn't changed, only update the status field
-                cursor.execute(
-                    "UPDATE customers SET status = ? WHERE domain = ?",
-                    (status, domain),
-                )
-        else:
-            # Insert new customer with current timestamp for both created_at and status_changed_at
-            cursor.execute(
-                "INSERT INTO customers (domain, status, created_at, status_changed_at) VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
-                (domain, status),
-            )
+@app.route("/api/set_customer_statuses", methods=["POST"])
+# No auth required for this endpoint by default
+def set_customer_statuses():
+    """Set or update the statuses of several customers in one request"""
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
 
-        db.commit()
+    data = request.get_json()
+    updates = data.get("updates") if isinstance(data, dict) else None
+    if not isinstance(updates, list):
+        return jsonify({"error": "updates must be a list"}), 400
+
+    # Validate everything up front so a bad entry doesn't leave a partial write
+    rows = []
+    for index, update in enumerate(updates):
+        try:
+            rows.append(_validate_status_update(update))
+        except ValueError as e:
+            return jsonify({"error": f"Update {index}: {e}"}), 400
+
+    try:
+        _set_customer_statuses(rows)
 
         return jsonify(
             {
                 "success": True,
-                "message": f"Customer {domain} status has been set to {CustomerStatus(status).name}",
+                "message": f"{len(rows)} customer statuses have been set",
+                "count": len(rows),
             }
         )
 
     except Exception as e:
-        # Rollback in case of error might be needed depending on transaction handling
         return jsonify({"error": str(e)}), 500
 
 
+# Julian day number of the Unix epoch, as used by SQLite's julianday()
+_UNIX_EPOCH = datetime(1970, 1, 1)
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def _julian_day(dt):
+    """Convert a naive UTC datetime to a Julian day number"""
+    return (dt - _UNIX_EPOCH).total_seconds() / 86400 + _UNIX_EPOCH_JULIAN_DAY
+
+
+@functools.lru_cache(maxsize=4096)
+def _julian_day_cached(timestamp):
+    """Julian day number for a SQLite CURRENT_TIMESTAMP string"""
+    return _julian_day(datetime.fromisoformat(timestamp))
+
+
+def _now_julian_day():
+    """Julian day number for the current UTC time"""
+    return _julian_day(datetime.now(timezone.utc).replace(tzinfo=None))
+
+
+# Rows encoded per chunk when streaming the customer list
+CUSTOMERS_STREAM_CHUNK_ROWS = 100
+
+# days_since_status_change is rounded to 0.1 day, so the ETag also changes
+# every 6 minutes to keep revalidated copies from showing stale ages
+_ETAG_BUCKETS_PER_DAY = 240
+
+
+def _customers_etag(db, now):
+    """ETag for the customer endpoints: data version plus a time bucket"""
+    row = db.execute(_SQL_GET_CUSTOMERS_VERSION).fetchone()
+    return f"{row['version']}-{int(now * _ETAG_BUCKETS_PER_DAY)}"
+
+
+def _with_cache_headers(response, etag):
+    """Mark a customer response as privately cacheable under the given ETag"""
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    # The UI re-fetches right after its own writes, so clients must always
+    # revalidate; an unchanged ETag still gets a 304 without running the SELECT
+    response.cache_control.no_cache = True
+    return response
+
+
 @app.route("/api/get_customers", methods=["GET"])
 @require_auth  # Protect this endpoint
 def get_customers():
     """Get all customers and their statuses"""
+    now = _now_julian_day()
+
     try:
         db = get_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT
-                domain,
-                status,
-                created_at,
-                status_changed_at,
-                (julianday('now') - julianday(status_changed_at)) as days_since_status_change
-            FROM customers
-            ORDER BY domain
-        """)
-        rows = cursor.fetchall()
-
-        customers = []
-        for row in rows:
-            status_enum = CustomerStatus(row["status"])
-            customers.append(
-                {
-                    "domain": row["domain"],
-                    "status": row["status"],
-                    "status_name": status_enum.name,
-                    "created_at": row["created_at"],
-                    "status_changed_at": row["status_changed_at"],
-                    "days_since_status_change": round(
-                        row["days_since_status_change"], 1
-                    ),
-                }
-            )
-
-        return jsonify(
-            {"success": True, "customers": customers, "count": len(customers)}
-        )
+        etag = _customers_etag(db, now)
+        # Nothing has changed since the client's copy, so skip the query
+        if request.if_none_match.contains_weak(etag):
+            return _with_cache_headers(Response(status=304), etag)
 
+        cursor = db.execute(_SQL_GET_CUSTOMERS)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    def generate():
+        # Rows are read lazily from the cursor and written out a chunk at a
+        # time, so the full customer list is never held in memory and the
+        # server isn't asked to write one tiny chunk per row
+        try:
+            yield b'{"success":true,"customers":['
+            count = 0
+            while True:
+                rows = cursor.fetchmany(CUSTOMERS_STREAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                chunk = b",".join(
+                    orjson.dumps(
+                        {
+                            "domain": row["domain"],
+                            "status": row["status"],
+                            "status_name": _STATUS_NAME[row["status"]],
+                            "created_at": row["created_at"],
+                            "status_changed_at": row["status_changed_at"],
+                            "days_since_status_change": round(
+                                now - _julian_day_cached(row["status_changed_at"]), 1
+                            ),
+                        }
+                    )
+                    for row in rows
+                )
+                yield (b"," if count else b"") + chunk
+                count += len(rows)
+            yield b'],"count":%d}' % count
+        finally:
+            # A client that disconnects mid-stream leaves the SELECT unfinished;
+            # close it so the pooled connection doesn't keep an old read snapshot
+            cursor.close()
+
+    # stream_with_context keeps the request (and its db connection) alive
+    # until the generator is exhausted
+    return _with_cache_headers(
+        Response(stream_with_context(generate()), mimetype="application/json"), etag
+    )
+
 
 @app.route("/api/get_customer_status/<domain>", methods=["GET"])
 @require_auth  # Protect this endpoint
 def get_customer_status(domain):
     """Get a specific customer's status by domain"""
     domain = domain.strip().lower()
+    now = _now_julian_day()
 
     try:
         db = get_db()
-        cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT
-                domain,
-                status,
-                created_at,
-                status_changed_at,
-                (julianday('now') - julianday(status_changed_at)) as days_since_status_change
-            FROM customers
-            WHERE domain = ?
-        """,
-            (domain,),
-        )
-        row = cursor.fetchone()
+        etag = _customers_etag(db, now)
+        if request.if_none_match.contains_weak(etag):
+            return _with_cache_headers(Response(status=304), etag)
+
+        row = db.execute(_SQL_GET_CUSTOMER, (domain,)).fetchone()
 
         if not row:
             return jsonify({"error": f"Customer with domain '{domain}' not found"}), 404
 
-        status_enum = CustomerStatus(row["status"])
-        return jsonify(
+        response = jsonify(
             {
                 "success": True,
                 "domain": row["domain"],
                 "status": row["status"],
-                "status_name": status_enum.name,
+                "status_name": _STATUS_NAME[row["status"]],
                 "created_at": row["created_at"],
                 "status_changed_at": row["status_changed_at"],
-                "days_since_status_change": round(row["days_since_status_change"], 1),
+                "days_since_status_change": round(
+                    now - _julian_day_cached(row["status_changed_at"]), 1
+                ),
             }
         )
+        return _with_cache_headers(response, etag)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -300,9 +620,7 @@ def get_settings():
     """Get all settings"""
     try:
         db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT key, value, updated_at FROM settings")
-        rows = cursor.fetchall()
+        rows = db.execute(_SQL_GET_SETTINGS).fetchall()
 
         settings = {}
         for row in rows:
@@ -330,11 +648,7 @@ def get_setting(key):
     """Get a specific setting by key"""
     try:
         db = get_db()
-        cursor = db.cursor()
-        cursor.execute(
-            "SELECT key, value, updated_at FROM settings WHERE key = ?", (key,)
-        )
-        row = cursor.fetchone()
+        row = db.execute(_SQL_GET_SETTING, (key,)).fetchone()
 
         if not row:
             return jsonify({"error": f"Setting with key '{key}' not found"}), 404
@@ -375,31 +689,23 @@ def update_setting(key):
     # Special validation for email
     if key == "user_email" and value:
         # Basic email validation
-        if not re.match(r"[^@]+@[^@]+\.[^@]+", value):
+        if not _EMAIL_RE.match(value):
             return jsonify({"error": "Invalid email format"}), 400
 
-    try:
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute(
-            "UPDATE settings SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ?",
-            (value, key),
-        )
+    # Only allow known keys
+    if key not in ["user_email", "password"]:
+        return jsonify({"error": f"Setting key '{key}' is not allowed"}), 400
 
-        if cursor.rowcount == 0:
-            # Setting doesn't exist, check if it's a valid key before inserting
-            if key not in ["user_email", "password"]:  # Only allow known keys
-                return jsonify({"error": f"Setting key '{key}' is not allowed"}), 400
-            cursor.execute(
-                "INSERT INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
-                (key, value),
-            )
+    try:
+        with write_db() as db:
+            db.execute(_SQL_UPSERT_SETTING, (key, value))
 
-        db.commit()
+        # Under the lock, so a reload that read the old rows can't store
+        # them with a fresh expiry after this invalidation
+        with _settings_lock:
+            _settings_cache["expires"] = 0.0
 
-        return jsonify(
-            {"success": True, "message": f"Setting '{key}' has been updated"}
-        )
+        return Response(_OK_SETTING % key.encode(), mimetype="application/json")
 
     except Exception as e:
         # Rollback might be needed
@@ -420,9 +726,34 @@ def settings():
     return render_template("settings.html")
 
 
+# Characters that mean an address needs the full RFC 2822 parser (quoting,
+# comments, groups, domain literals)
+_ADDRESS_SPECIALS_RE = re.compile(r'[\s"(),:;<>\[\]\\]')
+# Same for a display name, except that spaces are allowed and "@" is not
+_DISPLAY_NAME_SPECIALS_RE = re.compile(r'["(),:;<>@\[\]\\]')
+
+
 # Helper function to extract domain from email address
 def extract_domain_from_email(email):
     """Extract domain from email address"""
+    # Fast path for the common "user@host" and "Name <user@host>" forms
+    address = email.strip()
+    name = ""
+    if address.endswith(">"):
+        # Split at the first "<"; a second one, or anything but a plain name
+        # before it (e.g. another address), is left to parseaddr
+        name, _, address = address[:-1].partition("<")
+    local, _, domain = address.partition("@")
+    is_simple = (
+        local
+        and domain
+        and "@" not in domain
+        and not _ADDRESS_SPECIALS_RE.search(address)
+        and not _DISPLAY_NAME_SPECIALS_RE.search(name)
+    )
+    if is_simple:
+        return domain.lower()
+
     _, email_address = parseaddr(email)
     if not email_address or "@" not in email_address:
         return None
@@ -432,6 +763,12 @@ def extract_domain_from_email(email):
     return domain
 
 
+# Reused across calls so the TLS connection to the API is kept alive
+_ANTHROPIC_SESSION = requests.Session()
+# (connect, read) timeouts in seconds, so a stalled API call can't hang a worker
+ANTHROPIC_TIMEOUT = (5, 30)
+
+
 # Helper function to use Anthropic API for email analysis
 def analyze_email_with_anthropic(user_email, sender_domain, email_subject, email_body):
     """Analyze email content with Anthropic API"""
@@ -487,10 +824,13 @@ def analyze_email_with_anthropic(user_email, sender_domain, email_subject, email
             "tool_choice": {"type": "tool", "name": "set_customer_status"},
         }
 
-        response = requests.post(
-            "https://api.anthropic.com/v1/messages", headers=headers, json=payload
+        response = _ANTHROPIC_SESSION.post(
+            "https://api.anthropic.com/v1/messages",
+            headers=headers,
+            json=payload,
+            timeout=ANTHROPIC_TIMEOUT,
         )
-        response_data = response.json()
+        response_data = orjson.loads(response.content)
 
         if "content" not in response_data or not response_data["content"]:
             raise ValueError(f"Unexpected API response: {response_data}")
@@ -515,8 +855,21 @@ def analyze_email_with_anthropic(user_email, sender_domain, email_subject, email
         raise Exception(f"Anthropic API error: {str(e)}")
 
 
+def _lookup_customer_status(domain):
+    """Return a customer's current status value, or None if it's new"""
+    row = get_db().execute(_SQL_GET_CUSTOMER_STATUS, (domain,)).fetchone()
+    return row["status"] if row else None
+
+
+def _run_in_thread(func, *args):
+    """Run a blocking call in the default executor, keeping the request context"""
+    # Same as asyncio.to_thread, which needs Python 3.9+
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(None, contextvars.copy_context().run, func, *args)
+
+
 @app.route("/api/process-email", methods=["POST"])
-def process_email():
+async def process_email():
     """Process an incoming email from SendGrid webhook and update customer status"""
     try:
         # Extract data from SendGrid webhook payload
@@ -547,16 +900,22 @@ def process_email():
             ), 400
 
         # Get user email from settings
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT value FROM settings WHERE key = 'user_email'")
-        row = cursor.fetchone()
-        user_email = row["value"] if row else ""
+        user_email = _read_setting("user_email")
 
         # Decide which LLM to use based on available API keys
         if os.environ.get("ANTHROPIC_API_KEY"):
-            result = analyze_email_with_anthropic(
-                user_email, sender_domain, subject, email_body
+            # Look up the sender's current status while waiting on the API.
+            # Both calls block, so each runs in a thread; _run_in_thread copies
+            # the request context so get_db() works there.
+            result, previous_status = await asyncio.gather(
+                _run_in_thread(
+                    analyze_email_with_anthropic,
+                    user_email,
+                    sender_domain,
+                    subject,
+                    email_body,
+                ),
+                _run_in_thread(_lookup_customer_status, sender_domain),
             )
             llm_used = "Anthropic"
         else:
@@ -567,22 +926,38 @@ def process_email():
                 }
             ), 500
 
-        # Call set_customer_status endpoint internally
-        status_request = {
-            "domain": result.get("domain", sender_domain),
-            "status": result.get("status"),
-        }
+        # Validate the model's answer like any other status update, then write
+        # it directly instead of going back through the view function
+        try:
+            domain, status = _validate_status_update(
+                {
+                    "domain": result.get("domain", sender_domain),
+                    "status": result.get("status"),
+                }
+            )
+        except ValueError as e:
+            return jsonify(
+                {"success": False, "error": f"Invalid status from LLM: {e}"}
+            ), 500
 
-        # Make internal request to set_customer_status
-        status_response = set_customer_status()
-        status_data = json.loads(status_response.data)
+        _set_customer_statuses([(domain, status)])
+        status_data = {
+            "success": True,
+            "message": f"Customer {domain} status has been set to {_STATUS_NAME[status]}",
+        }
 
         return jsonify(
             {
                 "success": True,
                 "message": "Email processed successfully",
                 "sender_domain": sender_domain,
-                "status_set": CustomerStatus(result.get("status")).name,
+                "status_set": _STATUS_NAME[status],
+                # Status before this email, if the customer already existed
+                "previous_status": (
+                    _STATUS_NAME[previous_status]
+                    if previous_status is not None and domain == sender_domain
+                    else None
+                ),
                 "llm_used": llm_used,
                 "reasoning": result.get("reasoning", ""),
                 "status_response": status_data,
@@ -599,11 +974,7 @@ def process_email_debug():
     """Debug endpoint for email processing logic"""
     try:
         # Get user email from settings
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT value FROM settings WHERE key = 'user_email'")
-        row = cursor.fetchone()
-        user_email = row["value"] if row else ""
+        user_email = _read_setting("user_email")
 
         return jsonify(
             {
@@ -622,24 +993,39 @@ def process_email_debug():
 
 
 # Function to get the LLM prompt template
-def get_llm_prompt(user_email):
-    """Get the LLM prompt template with the user's email filled in"""
+@functools.lru_cache(maxsize=1)
+def _load_prompt_template():
+    """Read and compile the LLM prompt template (cached after the first call)"""
     prompt_path = os.path.join(os.path.dirname(__file__), "templates", "llm_prompt.txt")
+    # Errors are raised rather than returned so a failed read isn't cached
+    with open(prompt_path, "r") as file:
+        return Template(file.read())
 
-    # Check if template exists
-    if not os.path.exists(prompt_path):
-        return "Error: llm_prompt.txt template not found."
 
+def get_llm_prompt(user_email):
+    """Get the LLM prompt template with the user's email filled in"""
     try:
-        with open(prompt_path, "r") as file:
-            template_content = file.read()
+        template = _load_prompt_template()
+    except FileNotFoundError:
+        return "Error: llm_prompt.txt template not found."
     except IOError as e:
         return f"Error reading llm_prompt.txt: {e}"
 
-    template = Template(template_content)
     return template.render(user_email=user_email)
 
 
+def _reload_prompt_template(signum, frame):
+    """Drop the cached prompt template so edits to llm_prompt.txt are picked up"""
+    _load_prompt_template.cache_clear()
+
+
+# Compile the template at import time so even the first email skips the
+# parse. A missing file or bad template must not stop the app from starting;
+# the error shows up again when the prompt is first used.
+with contextlib.suppress(OSError, TemplateError):
+    _load_prompt_template()
+
+
 # Initialize database within app context
 def init_app(current_app):
     with current_app.app_context():
@@ -648,14 +1034,14 @@ def init_app(current_app):
         get_db()
 
 
-# Create the database file if it doesn't exist and initialize schema
-if not os.path.exists(DATABASE_PATH):
-    # Need an app context to initialize the DB properly if using g
-    temp_app = Flask(__name__)
-    with temp_app.app_context():
-        init_db()
-
 if __name__ == "__main__":
-    # Initialize the app (registers teardown)
+    # Initialize the app (registers teardown). The development server creates
+    # the database on first run; production runs `flask db-init` instead.
     init_app(app)
-    app.run(debug=True, port=7000)
+    # Send SIGHUP to reload the prompt template without restarting. Under
+    # gunicorn, `kill -HUP <master>` replaces the workers, which re-read it.
+    if hasattr(signal, "SIGHUP"):  # Not available on Windows
+        signal.signal(signal.SIGHUP, _reload_prompt_template)
+    # The debugger and reloader are for local development only; set
+    # FLASK_DEV=1 to enable them. Production should use gunicorn instead.
+    app.run(debug=os.environ.get("FLASK_DEV") == "1", port=7000)
@@ -0,0 +1,35 @@
+# Production server settings, picked up automatically by: gunicorn app:app
+import os
+
+# Only stdlib-backed schema.py is imported here: importing app in the master
+# would preload it, so HUP reloads would stop picking up code and templates
+from schema import DATABASE_PATH, SCHEMA_VERSION, read_schema_version
+
+bind = os.environ.get("BIND", "0.0.0.0:7000")
+
+# Each worker is a separate process with its own SQLite connection pool
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+
+# sqlite3 queries block inside C code, which gevent's monkey-patching can't
+# make cooperative, so a slow query would stall every greenlet in the worker.
+# Use real threads instead. Keep threads <= DB_POOL_SIZE in app.py so every
+# thread can hold a pooled connection.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Allow time for the Anthropic call in /api/process-email
+timeout = 60
+
+
+def on_starting(server):
+    """Refuse to start until `flask --app app db-init` has been run"""
+    version = read_schema_version()
+    if version < SCHEMA_VERSION:
+        server.log.error(
+            "Database %s schema is at version %d, expected %d. "
+            "Run `flask --app app db-init` before starting the server.",
+            DATABASE_PATH,
+            version,
+            SCHEMA_VERSION,
+        )
+        raise SystemExit(1)
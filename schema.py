@@ -0,0 +1,22 @@
+# Database location and schema version, kept apart from app.py so that
+# gunicorn.conf.py can check the schema without importing the Flask app
+import contextlib
+import sqlite3
+
+DATABASE_PATH = "customer_tracker.db"
+
+# Bump whenever _SCHEMA_SQL in app.py changes. It is stored in the database's
+# user_version so init_db() can skip the DDL once it has run.
+SCHEMA_VERSION = 2
+
+
+def read_schema_version(path=DATABASE_PATH):
+    """Return the database's user_version, or 0 if it doesn't exist yet"""
+    try:
+        # Read-only, so a missing database isn't created as a side effect
+        uri = f"file:{path}?mode=ro"
+        with contextlib.closing(sqlite3.connect(uri, uri=True)) as conn:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return version